@@ -2,19 +2,38 @@ import requests
 from bs4 import BeautifulSoup
 import os
 import re
-import fiona
-import subprocess
-import pandas as pd
+import weakref
+import shapely
+import pyogrio
+import pyarrow as pa
+import numpy as np
 import geopandas as gpd
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-import xml.etree.ElementTree as ET
-from mpl_toolkits.basemap import Basemap
+from lxml import etree
+from urllib3.util.retry import Retry
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 
 # Define the URL of the Sentinel-2 Acquisition Plans page
 ACQUISITION_PLANS_URL = "https://sentinels.copernicus.eu/web/sentinel/copernicus/sentinel-2/acquisition-plans"
 BASE_URL = "https://sentinels.copernicus.eu/documents/d/sentinel/"
 
+# Shared HTTP session so the page and KML downloads reuse TLS connections and retry transient errors
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_maxsize=8,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504])
+))
+
+# Cell size (degrees) of the rasterized coverage grid, and the batch size from which
+# find_acq_plans_over_locations builds the grid instead of querying the STRtree.
+# On the 2,242 footprints of QGIS/S2_ACQ.gpkg the grid takes ~0.9 s to build and saves
+# ~0.2 s per 100k points, so a first batch only pays for it from roughly 500k points.
+COVERAGE_GRID_RESOLUTION = 1.0
+COVERAGE_GRID_MIN_POINTS = 500_000
+
+# Coverage grids built so far, keyed by id() of the GeoDataFrame they were built from
+_coverage_grids = {}
+
 output_directory = "sentinel_kml_data"
 os.makedirs(output_directory, exist_ok=True)
 
@@ -24,9 +43,9 @@ def fetch_latest_kml_links(url):
     the URLs of the latest KML files for Sentinel-2A, 2B, and 2C.
     """
     try:
-        response = requests.get(url)
+        response = SESSION.get(url, timeout=30)
         response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = BeautifulSoup(response.text, 'lxml')
 
         latest_kml_links = {}
 
@@ -42,13 +61,14 @@ def fetch_latest_kml_links(url):
         exit()
         """
 
+        # Index the H4 tags by their text in a single pass, keeping the first tag for each heading
+        h4_map = {}
+        for h4 in soup.find_all('h4'):
+            h4_map.setdefault(h4.text.strip(), h4)
+
         for satellite_name in satellites:
             # Find the H4 tag for the current satellite
-            h4_tag = None
-            for h4 in soup.find_all('h4'):
-                if h4.text.strip() == satellite_name:
-                    h4_tag = h4
-                    break
+            h4_tag = h4_map.get(satellite_name)
             if h4_tag:
                 # Find the immediate sibling ul (unordered list)
                 ul_tag = h4_tag.find_next_sibling('ul')
@@ -85,60 +105,107 @@ def fetch_latest_kml_links(url):
 
 def download_and_parse_kml(satellite_name, kml_filename, output_dir):
     """
-    Downloads a KML file using curl. If the file already exists, it will not be redownloaded.
-    Loads the KML file as a GeoDataFrame using geopandas and fiona, loading all layers.
+    Downloads a KML file with requests. If the file already exists, it will not be redownloaded.
+    Loads the NOMINAL layers of the KML file as a GeoDataFrame using pyogrio.
+    The parsed GeoDataFrame is cached as GeoParquet next to the KML and reused on later runs.
     """
     kml_url = f"{BASE_URL}{kml_filename}"
     local_filepath = os.path.join(output_dir, f"{kml_filename}.kml")
+    parquet_filepath = f"{local_filepath}.parquet"
+
+    # Reuse the GeoDataFrame parsed on a previous run instead of reparsing the KML
+    if os.path.exists(local_filepath) and os.path.exists(parquet_filepath):
+        try:
+            gdf = gpd.read_parquet(parquet_filepath)
+            print(f"\n{satellite_name}: loaded {len(gdf)} features from cached {parquet_filepath}.")
+            return build_spatial_index(gdf)
+        except Exception as e:
+            print(f"Error reading cached GeoParquet for {satellite_name}, reparsing KML: {e}")
 
     if os.path.exists(local_filepath):
         print(f"\n{satellite_name}: {local_filepath} already exists, skipping download.")
     else:
         print(f"\nDownloading {satellite_name} KML from: {kml_url}")
+        # Download to a temporary name and move it into place only once the transfer completes
+        partial_filepath = f"{local_filepath}.part"
         try:
-            # Use curl for faster download
-            result = subprocess.run([
-                "curl", "-L", "-sS", "-o", local_filepath, kml_url
-            ], check=True)
+            # Stream the download so the GIL is released while waiting on the network
+            with SESSION.get(kml_url, stream=True, timeout=30) as response:
+                response.raise_for_status()
+                with open(partial_filepath, 'wb') as kml_file:
+                    # iter_content raises dropped connections as requests exceptions
+                    for chunk in response.iter_content(chunk_size=1024 * 1024):
+                        kml_file.write(chunk)
+            os.replace(partial_filepath, local_filepath)
             print(f"Downloaded {satellite_name} KML to: {local_filepath}")
-        except subprocess.CalledProcessError as e:
-            print(f"Error downloading {satellite_name} KML with curl: {e}")
+        except requests.exceptions.RequestException as e:
+            print(f"Error downloading {satellite_name} KML: {e}")
+            # Do not leave a partial file behind, it would be skipped on the next run
+            if os.path.exists(partial_filepath):
+                os.remove(partial_filepath)
             return None
 
     try:
-        # Load all layers from the KML file
-        fiona.drvsupport.supported_drivers['KML'] = 'rw'
-        layers = fiona.listlayers(local_filepath)
-        gdf_list = []
-        
-        for layer in layers:
-            # Skip layers that do not start with 'NOMINAL'
-            # This is to avoid loading layers that are not relevant acquisition plans
-            if not layer.startswith('NOMINAL'):
-                continue
-            gdf = gpd.read_file(local_filepath, layer=layer)
-            gdf_list.append(gdf)
-        gdf = pd.concat(gdf_list, ignore_index=True)
+        # Skip layers that do not start with 'NOMINAL'
+        # This is to avoid loading layers that are not relevant acquisition plans
+        layers = [name for name, _ in pyogrio.list_layers(local_filepath) if name.startswith('NOMINAL')]
+        gdf = read_layers_arrow(local_filepath, layers)
 
         gdf = add_begin_timestamp_to_gdf(local_filepath, gdf)
         print(f"Loaded {satellite_name} KML as GeoDataFrame with {len(gdf)} features.")
-        return gdf
     except Exception as e:
-        print(f"Error reading KML for {satellite_name} with geopandas/fiona: {e}")
+        print(f"Error reading KML for {satellite_name} with pyogrio: {e}")
         return None
 
+    try:
+        gdf.to_parquet(parquet_filepath)
+    except Exception as e:
+        # Caching is best effort; the parsed GeoDataFrame is still usable
+        print(f"Could not cache {satellite_name} GeoDataFrame to {parquet_filepath}: {e}")
+    return build_spatial_index(gdf)
+
+def read_layers_arrow(kml_path, layers):
+    """
+    Reads the given KML layers as Arrow tables with pyogrio, joins them with a zero-copy
+    pyarrow.concat_tables and converts to a GeoDataFrame once, instead of building a pandas
+    frame per layer and copying them all again in pd.concat.
+    """
+    tables = []
+    for layer in layers:
+        meta, table = pyogrio.read_arrow(kml_path, layer=layer)
+        # pyogrio names the WKB column 'wkb_geometry' when the layer does not name it
+        geometry_name = meta['geometry_name'] or 'wkb_geometry'
+        tables.append(table.rename_columns(['geometry' if name == geometry_name else name for name in table.column_names]))
+    # Layers with different fields are unified, missing values become nulls as in pd.concat
+    return gpd.GeoDataFrame.from_arrow(pa.concat_tables(tables, promote_options='default'))
+
+def build_spatial_index(gdf):
+    """
+    Builds the GeoDataFrame's STRtree spatial index at load time, so every location
+    query reuses the same index instead of scanning all acquisition footprints.
+    Also prepares the geometries in place, which speeds up repeated contains() tests.
+    """
+    gdf.sindex
+    shapely.prepare(gdf.geometry.values)
+    return gdf
+
 def add_begin_timestamp_to_gdf(kml_path, gdf):
     ns = {'kml': 'http://www.opengis.net/kml/2.2'}
-    tree = ET.parse(kml_path)
-    root = tree.getroot()
-    placemarks = root.findall('.//kml:Placemark', ns)
-    name_to_begin = {}
-    for pm in placemarks:
+    names = []
+    begins = []
+    # Stream the Placemarks once with lxml instead of building the whole ElementTree
+    context = etree.iterparse(kml_path, events=('end',), tag='{http://www.opengis.net/kml/2.2}Placemark')
+    for _, pm in context:
         name_elem = pm.find('kml:name', ns)
-        timespan_elem = pm.find('kml:TimeSpan', ns)
-        begin_elem = timespan_elem.find('kml:begin', ns) if timespan_elem is not None else None
+        begin_elem = pm.find('kml:TimeSpan/kml:begin', ns)
         if name_elem is not None and begin_elem is not None:
-            name_to_begin[name_elem.text] = begin_elem.text
+            names.append(name_elem.text)
+            begins.append(begin_elem.text)
+        # Free the processed Placemark and its earlier siblings to keep memory flat
+        pm.clear()
+        while pm.getprevious() is not None:
+            del pm.getparent()[0]
+    name_to_begin = dict(zip(names, begins))
     # Add the 'begin' column to the GeoDataFrame
     if 'Name' in gdf.columns:
         gdf['begin'] = gdf['Name'].map(name_to_begin)
@@ -155,26 +222,168 @@ def find_acq_plans_over_location(lat, lon, kml_data_objects):
     point = Point(lon, lat)
     found = False
     for satellite, gdf in kml_data_objects.items():
-        # Check if any geometry in the GeoDataFrame contains the point
-        matches = gdf[gdf.geometry.contains(point)]
+        # Use the STRtree to find the footprints whose bounding box holds the point,
+        # then run the exact test on the prepared geometries of those candidates only
+        candidates = gdf.iloc[sorted(gdf.sindex.query(point))]
+        matches = candidates[candidates.geometry.contains(point)]
         if not matches.empty:
             found = True
-            print(f"{satellite}:")
-            # Find the ID and begin columns
-            id_col = None
-            for col in ["Name", "name", "ID", "id"]:
-                if col in matches.columns:
-                    id_col = col
-                    break
-            begin_col = "begin" if "begin" in matches.columns else None
-            # Print each row on one line, showing ID and begin timestamp if available
-            for idx, row in matches.iterrows():
-                id_val = row[id_col] if id_col else "<no id>"
-                begin_val = row[begin_col] if begin_col else "<no begin>"
-                print(f"  {id_val}\t{begin_val}")
+            print_acq_plan_matches(satellite, matches)
     if not found:
         print(f"No acquisition plan passes over ({lat}, {lon}) for any satellite.")
 
+def find_acq_plans_over_locations(locations, kml_data_objects):
+    """
+    Batched version of find_acq_plans_over_location for a dict of {location_name: (lat, lon)}.
+    All locations are matched against each satellite with one vectorized query,
+    then the matching acquisition plans are printed per location.
+    """
+    location_names = np.asarray(list(locations), dtype=object)
+    lats = np.array([lat for lat, _ in locations.values()], dtype=float)
+    lons = np.array([lon for _, lon in locations.values()], dtype=float)
+    points = shapely.points(lons, lats)
+
+    hits_by_satellite = {}
+    for satellite, gdf in kml_data_objects.items():
+        if id(gdf) in _coverage_grids or len(location_names) >= COVERAGE_GRID_MIN_POINTS:
+            # Look every point up by grid cell; the grid is built once and reused by later batches
+            point_idx, positions = query_coverage_grid(get_coverage_grid(gdf), gdf, lats, lons)
+        else:
+            point_idx, positions = query_spatial_index(gdf, points)
+        hits = gdf.iloc[positions].assign(location=location_names[point_idx])
+        hits_by_satellite[satellite] = dict(tuple(hits.groupby('location', sort=False)))
+
+    for location_name, (lat, lon) in locations.items():
+        print(f"\nAcquisition plans for {location_name} ({lat:.4f}, {lon:.4f})") # Avoid truncation
+        found = False
+        for satellite, matches_by_location in hits_by_satellite.items():
+            matches = matches_by_location.get(location_name)
+            if matches is not None and not matches.empty:
+                found = True
+                print_acq_plan_matches(satellite, matches)
+        if not found:
+            print(f"No acquisition plan passes over ({lat}, {lon}) for any satellite.")
+
+def query_spatial_index(gdf, points):
+    """
+    Looks up an array of query points in the STRtree built by build_spatial_index.
+    Returns (point_idx, positions) pairs for the footprints that contain each point,
+    sorted by footprint position so the plans keep their KML order.
+    """
+    point_idx, positions = gdf.sindex.query(points)
+
+    # The tree only compares bounding boxes; run the exact test on the prepared footprints
+    geometries = np.asarray(gdf.geometry.values)[positions]
+    inside = shapely.contains(geometries, points[point_idx])
+    point_idx, positions = point_idx[inside], positions[inside]
+
+    order = np.argsort(positions, kind='stable')
+    return point_idx[order], positions[order]
+
+def get_coverage_grid(gdf):
+    """
+    Returns the coverage grid of gdf, building it on first use.
+    The grid is dropped when gdf is garbage collected.
+    """
+    key = id(gdf)
+    if key not in _coverage_grids:
+        _coverage_grids[key] = build_coverage_grid(gdf)
+        weakref.finalize(gdf, _coverage_grids.pop, key, None)
+    return _coverage_grids[key]
+
+def build_coverage_grid(gdf, resolution=COVERAGE_GRID_RESOLUTION):
+    """
+    Rasterizes each acquisition footprint onto a global lat/lon grid and records which
+    footprints touch each cell. The cell lists are stored CSR-style: the footprint positions
+    for cell i are positions[offsets[i]:offsets[i + 1]].
+    """
+    from rasterio import features
+    from rasterio.transform import from_origin
+
+    n_rows = int(round(180 / resolution))
+    n_cols = int(round(360 / resolution))
+    cell_chunks = []
+    position_chunks = []
+
+    for position, geom in enumerate(gdf.geometry):
+        if geom is None or geom.is_empty:
+            continue
+        # Rasterize only over the footprint's bounding box, clipped to the grid
+        minx, miny, maxx, maxy = geom.bounds
+        col0 = max(int(np.floor((minx + 180) / resolution)), 0)
+        col1 = min(int(np.floor((maxx + 180) / resolution)) + 1, n_cols)
+        row0 = max(int(np.floor((90 - maxy) / resolution)), 0)
+        row1 = min(int(np.floor((90 - miny) / resolution)) + 1, n_rows)
+        if col0 >= col1 or row0 >= row1:
+            continue
+        # all_touched keeps every cell the footprint overlaps, so the grid never misses a match
+        mask = features.rasterize(
+            [(geom, 1)],
+            out_shape=(row1 - row0, col1 - col0),
+            transform=from_origin(-180 + col0 * resolution, 90 - row0 * resolution, resolution, resolution),
+            fill=0,
+            all_touched=True,
+            dtype='uint8'
+        )
+        rows, cols = np.nonzero(mask)
+        cell_chunks.append((rows + row0) * n_cols + (cols + col0))
+        position_chunks.append(np.full(len(rows), position, dtype=np.int64))
+
+    cells = np.concatenate(cell_chunks) if cell_chunks else np.empty(0, dtype=np.int64)
+    positions = np.concatenate(position_chunks) if position_chunks else np.empty(0, dtype=np.int64)
+    order = np.argsort(cells, kind='stable')
+    return {
+        'resolution': resolution,
+        'n_rows': n_rows,
+        'n_cols': n_cols,
+        'offsets': np.searchsorted(cells[order], np.arange(n_rows * n_cols + 1)),
+        'positions': positions[order],
+    }
+
+def query_coverage_grid(grid, gdf, lats, lons):
+    """
+    Looks up arrays of query points in a coverage grid built from gdf.
+    Returns (point_idx, positions) pairs for the footprints that contain each point,
+    sorted by footprint position so the plans keep their KML order.
+    """
+    resolution = grid['resolution']
+    rows = np.clip(((90 - lats) / resolution).astype(np.int64), 0, grid['n_rows'] - 1)
+    cols = np.clip(((lons + 180) / resolution).astype(np.int64), 0, grid['n_cols'] - 1)
+    cells = rows * grid['n_cols'] + cols
+
+    # Expand every point to the footprints listed for its cell
+    starts = grid['offsets'][cells]
+    counts = grid['offsets'][cells + 1] - starts
+    point_idx = np.repeat(np.arange(len(cells)), counts)
+    segment_starts = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    positions = grid['positions'][segment_starts + np.arange(counts.sum())]
+
+    # Grid cells only give candidates; run the exact test on those pairs
+    geometries = np.asarray(gdf.geometry.values)[positions]
+    inside = shapely.contains(geometries, shapely.points(lons[point_idx], lats[point_idx]))
+    point_idx, positions = point_idx[inside], positions[inside]
+
+    order = np.argsort(positions, kind='stable')
+    return point_idx[order], positions[order]
+
+def print_acq_plan_matches(satellite, matches):
+    """
+    Prints the acquisition plans of one satellite, one per line, showing ID and 'begin' timestamp.
+    """
+    print(f"{satellite}:")
+    # Find the ID and begin columns
+    id_col = None
+    for col in ["Name", "name", "ID", "id"]:
+        if col in matches.columns:
+            id_col = col
+            break
+    begin_col = "begin" if "begin" in matches.columns else None
+    # Print each row on one line, showing ID and begin timestamp if available
+    for idx, row in matches.iterrows():
+        id_val = row[id_col] if id_col else "<no id>"
+        begin_val = row[begin_col] if begin_col else "<no begin>"
+        print(f"  {id_val}\t{begin_val}")
+
 if __name__ == "__main__":
     print(f"Fetching latest KML links from: {ACQUISITION_PLANS_URL}")
     latest_kml_filenames = fetch_latest_kml_links(ACQUISITION_PLANS_URL)
@@ -187,10 +396,15 @@ if __name__ == "__main__":
             print(f"{satellite}: {filename}")
 
         print("\n--- Downloading and Parsing KML Files ---")
-        for satellite, filename in latest_kml_filenames.items():
-            kml_object = download_and_parse_kml(satellite, filename, output_directory)
-            if kml_object is not None:
-                kml_data_objects[satellite] = kml_object
+        # The satellites share no state, so download and parse them concurrently
+        with ThreadPoolExecutor(max_workers=len(latest_kml_filenames)) as executor:
+            kml_objects = executor.map(
+                lambda item: download_and_parse_kml(item[0], item[1], output_directory),
+                latest_kml_filenames.items()
+            )
+            for satellite, kml_object in zip(latest_kml_filenames, kml_objects):
+                if kml_object is not None:
+                    kml_data_objects[satellite] = kml_object
 
         print("\n--- KML Data Objects Loaded ---")
         for satellite, kml_object in kml_data_objects.items():
@@ -215,12 +429,14 @@ if __name__ == "__main__":
             "New York, NY": (40.7143, -74.0060),
             "Chicago, IL": (41.8500, -87.6500)
         }
-        for location_name, (lat, lon) in locations.items():
-            print(f"\nAcquisition plans for {location_name} ({lat:.4f}, {lon:.4f})") # Avoid truncation
-            find_acq_plans_over_location(lat, lon, kml_data_objects)
+        find_acq_plans_over_locations(locations, kml_data_objects)
 
         # --- Plot all three acquisition plans on a map ---
         # Also mark the target locations on the map
+        # Plotting libraries are imported here so importing this module for queries stays fast
+        import matplotlib.pyplot as plt
+        import matplotlib.patches as mpatches
+
         plt.figure(figsize=(10, 8))
         ax = plt.gca()
         colors = ['red', 'green', 'blue']
@@ -232,6 +448,7 @@ if __name__ == "__main__":
 
         # Draw coastlines using Basemap for better geographic context
         try:
+            from mpl_toolkits.basemap import Basemap
             m = Basemap(projection='cyl',
                         llcrnrlat=-90, urcrnrlat=90,
                         llcrnrlon=-180, urcrnrlon=180,
@@ -1,23 +1,38 @@
 import requests
-from bs4 import BeautifulSoup
 import os
-import re
-import io
-import fiona
-import subprocess
+import json
+import glob
+import hashlib
+import shapely
+import numpy as np
 import pandas as pd
 import geopandas as gpd
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
-import xml.etree.ElementTree as ET
-from mpl_toolkits.basemap import Basemap
+from lxml import etree, html
+from urllib3.util.retry import Retry
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Define the URL of the Sentinel-2 Acquisition Plans page
 ACQUISITION_PLANS_URL = "https://sentinels.copernicus.eu/web/sentinel/copernicus/sentinel-2/acquisition-plans"
 BASE_URL = "https://sentinels.copernicus.eu/documents/d/sentinel/"
+# Natural Earth 1:110m coastlines, drawn under the acquisition plans
+COASTLINE_URL = "https://naciscdn.org/naturalearth/110m/physical/ne_110m_coastline.zip"
+# Simplification tolerance (degrees) for drawing the acquisition polygons on the world map
+PLOT_SIMPLIFY_TOLERANCE = 0.1
+
+# Shared HTTP session so the page and KML downloads reuse TLS connections and retry transient errors
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_maxsize=8,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504])
+))
 
 output_directory = "sentinel_kml_data"
 os.makedirs(output_directory, exist_ok=True)
+# Validators and KML filenames from the last fetch of the acquisition plans page
+ACQUISITION_PLANS_CACHE = os.path.join(output_directory, ".acq_etag.json")
 
 TABLE_COLUMNS = [
     "Polygon",
@@ -40,15 +55,76 @@ TABLE_COLUMNS = [
     "layer"
 ]
 
-def fetch_latest_kml_links(url):
+KML_NS = "http://www.opengis.net/kml/2.2"
+KML_CONTAINER_TAGS = {f"{{{KML_NS}}}Document", f"{{{KML_NS}}}Folder"}
+KML_NAME_TAG = f"{{{KML_NS}}}name"
+KML_PLACEMARK_TAG = f"{{{KML_NS}}}Placemark"
+
+# Per-Placemark lookups, compiled once instead of reparsing the path on every call
+KML_XPATH_NS = {'kml': KML_NS}
+XPATH_NAME = etree.XPath('kml:name/text()', namespaces=KML_XPATH_NS)
+XPATH_BEGIN = etree.XPath('kml:TimeSpan/kml:begin/text()', namespaces=KML_XPATH_NS)
+XPATH_END = etree.XPath('kml:TimeSpan/kml:end/text()', namespaces=KML_XPATH_NS)
+XPATH_STYLE_URL = etree.XPath('kml:styleUrl/text()', namespaces=KML_XPATH_NS)
+XPATH_DATA = etree.XPath('kml:ExtendedData/kml:Data', namespaces=KML_XPATH_NS)
+XPATH_DATA_VALUE = etree.XPath('kml:value', namespaces=KML_XPATH_NS)
+XPATH_COORDINATES = etree.XPath('(.//kml:Polygon//kml:coordinates)[1]/text()', namespaces=KML_XPATH_NS)
+
+# Acquisition plans page lookups: the first link listed under each satellite's H4 heading
+KML_DOCUMENTS_PATH = "documents/d/sentinel/"
+XPATH_SATELLITE_HEADING = etree.XPath('(//h4[normalize-space(.) = $name])[1]')
+XPATH_NEXT_UL = etree.XPath('following-sibling::ul[1]')
+XPATH_FIRST_LI = etree.XPath('(.//li)[1]')
+XPATH_FIRST_HREF = etree.XPath('(.//a[@href])[1]/@href')
+
+# ExtendedData fields copied from each Placemark into the table
+EXTENDED_FIELDS = [
+    'ID', 'Timeliness', 'Station', 'Mode', 'ObservationTimeStart',
+    'ObservationTimeStop', 'ObservationDuration', 'OrbitAbsolute',
+    'OrbitRelative', 'Scenes', 'timestamp'
+]
+
+def load_page_cache(cache_path):
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_page_cache(cache_path, response, latest_kml_links):
+    cache = {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'links': latest_kml_links
+    }
+    try:
+        with open(cache_path, 'w') as f:
+            json.dump(cache, f)
+    except OSError as e:
+        print(f"Could not write {cache_path}: {e}")
+
+def fetch_latest_kml_links(url, cache_path=ACQUISITION_PLANS_CACHE):
     """
     Fetches the HTML content of the acquisition plans page and extracts
     the URLs of the latest KML files for Sentinel-2A, 2B, and 2C.
+    The request is conditional on the previous ETag/Last-Modified, so an unchanged
+    page is answered with 304 and the filenames found last time are reused.
     """
     try:
-        response = requests.get(url)
+        cache = load_page_cache(cache_path)
+        headers = {}
+        if cache.get('links'):
+            if cache.get('etag'):
+                headers['If-None-Match'] = cache['etag']
+            if cache.get('last_modified'):
+                headers['If-Modified-Since'] = cache['last_modified']
+
+        response = SESSION.get(url, headers=headers, timeout=30)
+        if response.status_code == 304:
+            print("Acquisition plans page unchanged, using cached KML filenames.")
+            return dict(cache['links'])
         response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
-        soup = BeautifulSoup(response.text, 'html.parser')
+        tree = html.fromstring(response.content)
 
         latest_kml_links = {}
 
@@ -59,43 +135,41 @@ def fetch_latest_kml_links(url):
 
         # DEBUG: Print all h4 tags to understand the structure of the page
         """
-        for h4 in soup.find_all('h4'):
-            print(f"Found H4 tag: `{h4.text}`")
+        for h4 in tree.iter('h4'):
+            print(f"Found H4 tag: `{h4.text_content()}`")
         exit()
         """
 
         for satellite_name in satellites:
             # Find the H4 tag for the current satellite
-            h4_tag = None
-            for h4 in soup.find_all('h4'):
-                if h4.text.strip() == satellite_name:
-                    h4_tag = h4
-                    break
-            if h4_tag:
-                # Find the immediate sibling ul (unordered list)
-                ul_tag = h4_tag.find_next_sibling('ul')
-                if ul_tag:
-                    # Get the first list item (li) and then the anchor tag (a) within it
-                    first_li = ul_tag.find('li')
-                    if first_li:
-                        link_tag = first_li.find('a', href=True)
-                        if link_tag:
-                            full_kml_url = link_tag['href']
-                            # Extract just the filename from the URL
-                            filename_match = re.search(r'documents/d/sentinel/(.*)', full_kml_url)
-                            if filename_match:
-                                filename = filename_match.group(1)
-                                latest_kml_links[satellite_name] = filename
-                            else:
-                                print(f"Could not extract filename from URL: {full_kml_url}")
-                        else:
-                            print(f"No link found in the first list item for {satellite_name}.")
-                    else:
-                        print(f"No list items found for {satellite_name}.")
-                else:
-                    print(f"No unordered list found after {satellite_name} heading.")
-            else:
+            h4_tags = XPATH_SATELLITE_HEADING(tree, name=satellite_name)
+            if not h4_tags:
                 print(f"Could not find heading for {satellite_name}.")
+                continue
+            # Find the immediate sibling ul (unordered list)
+            ul_tags = XPATH_NEXT_UL(h4_tags[0])
+            if not ul_tags:
+                print(f"No unordered list found after {satellite_name} heading.")
+                continue
+            # Get the first list item (li) and then the anchor tag (a) within it
+            first_li = XPATH_FIRST_LI(ul_tags[0])
+            if not first_li:
+                print(f"No list items found for {satellite_name}.")
+                continue
+            hrefs = XPATH_FIRST_HREF(first_li[0])
+            if not hrefs:
+                print(f"No link found in the first list item for {satellite_name}.")
+                continue
+            full_kml_url = hrefs[0]
+            # Extract just the filename from the URL
+            _, sep, filename = full_kml_url.rpartition(KML_DOCUMENTS_PATH)
+            if sep and filename:
+                latest_kml_links[satellite_name] = filename
+            else:
+                print(f"Could not extract filename from URL: {full_kml_url}")
+
+        if latest_kml_links:
+            save_page_cache(cache_path, response, latest_kml_links)
         return latest_kml_links
 
     except requests.exceptions.RequestException as e:
@@ -107,8 +181,9 @@ def fetch_latest_kml_links(url):
 
 def download_and_parse_kml(satellite_name, kml_filename, output_dir):
     """
-    Downloads a KML file using curl. If the file already exists, it will not be redownloaded.
-    Loads the KML file as a GeoDataFrame using geopandas and fiona, loading all layers.
+    Downloads a KML file with requests. If the file already exists, it will not be redownloaded.
+    Parses the NOMINAL layers of the KML file into a GeoDataFrame in a single lxml pass.
+    The result is cached as GeoParquet and reused while the KML contents are unchanged.
     """
     kml_url = f"{BASE_URL}{kml_filename}"
     filename_root = os.path.basename(kml_filename)
@@ -122,123 +197,176 @@ def download_and_parse_kml(satellite_name, kml_filename, output_dir):
         print(f"\n{satellite_name}: {local_filepath} already exists, skipping download.")
     else:
         print(f"\nDownloading {satellite_name} KML from: {kml_url}")
+        # Download to a temporary name and move it into place only once the transfer completes
+        partial_filepath = f"{local_filepath}.part"
         try:
-            # Use curl for faster download
-            result = subprocess.run([
-                "curl", "-L", "-sS", "-o", local_filepath, kml_url
-            ], check=True)
+            # Stream the download over the shared session instead of spawning curl
+            with SESSION.get(kml_url, stream=True, timeout=30) as response:
+                response.raise_for_status()
+                with open(partial_filepath, 'wb') as kml_file:
+                    # iter_content raises dropped connections as requests exceptions
+                    for chunk in response.iter_content(chunk_size=1024 * 1024):
+                        kml_file.write(chunk)
+            os.replace(partial_filepath, local_filepath)
             print(f"Downloaded {satellite_name} KML to: {local_filepath}")
-        except subprocess.CalledProcessError as e:
-            print(f"Error downloading {satellite_name} KML with curl: {e}")
+        except requests.exceptions.RequestException as e:
+            print(f"Error downloading {satellite_name} KML: {e}")
+            # Do not leave a partial file behind, it would be skipped on the next run
+            if os.path.exists(partial_filepath):
+                os.remove(partial_filepath)
             return None
 
-    try:
-        # Load all layers from the KML file
-        fiona.drvsupport.supported_drivers['KML'] = 'rw'
-        layers = fiona.listlayers(local_filepath)
-        gdf_list = []
-        
-        for layer in layers:
-            # Skip layers that do not start with 'NOMINAL'
-            # This is to avoid loading layers that are not relevant acquisition plans
-            if not layer.startswith('NOMINAL'):
-                continue
-            gdf = gpd.read_file(local_filepath, layer=layer)
-            gdf_list.append(gdf)
-        gdf = pd.concat(gdf_list, ignore_index=True)
+    # The parsed GeoDataFrame is cached next to the KML, keyed by a hash of the KML contents
+    parquet_filepath = f"{local_filepath}.{file_sha256(local_filepath)}.parquet"
+    if os.path.exists(parquet_filepath):
+        try:
+            gdf = gpd.read_parquet(parquet_filepath)
+            # Build the STRtree once at load time; every location query reuses it
+            gdf.sindex
+            print(f"Loaded {satellite_name} GeoDataFrame with {len(gdf)} features from cached {parquet_filepath}.")
+            return gdf
+        except Exception as e:
+            print(f"Error reading cached GeoParquet for {satellite_name}, reparsing KML: {e}")
 
-        gdf = augment_gdf_with_metadata(local_filepath, gdf, layer_code, satellite_name)
+    try:
+        gdf = parse_kml_to_gdf(local_filepath, layer_code, satellite_name)
+        # Build the STRtree once at load time; every location query reuses it
+        gdf.sindex
         print(f"Loaded {satellite_name} KML as GeoDataFrame with {len(gdf)} features.")
-        return gdf
     except Exception as e:
-        print(f"Error reading KML for {satellite_name} with geopandas/fiona: {e}")
+        print(f"Error reading KML for {satellite_name} with lxml: {e}")
         return None
 
-def augment_gdf_with_metadata(kml_path, gdf, layer_code, satellite_name):
-    ns = {'kml': 'http://www.opengis.net/kml/2.2'}
-    tree = ET.parse(kml_path)
-    root = tree.getroot()
-    placemarks = root.findall('.//kml:Placemark', ns)
-    placemark_metadata = {}
-
-    for pm in placemarks:
-        name_elem = pm.find('kml:name', ns)
-        if name_elem is None or not name_elem.text:
-            continue
-        name_text = name_elem.text.strip()
-
-        timespan_elem = pm.find('kml:TimeSpan', ns)
-        begin_text = None
-        end_text = None
-        if timespan_elem is not None:
-            begin_elem = timespan_elem.find('kml:begin', ns)
-            end_elem = timespan_elem.find('kml:end', ns)
-            begin_text = begin_elem.text.strip() if begin_elem is not None and begin_elem.text else None
-            end_text = end_elem.text.strip() if end_elem is not None and end_elem.text else None
-
-        style_elem = pm.find('kml:styleUrl', ns)
-        style_text = style_elem.text.strip() if style_elem is not None and style_elem.text else None
-
-        data_fields = {}
-        for data_elem in pm.findall('kml:ExtendedData/kml:Data', ns):
-            key = data_elem.get('name')
-            if not key:
-                continue
-            value_elem = data_elem.find('kml:value', ns)
-            if value_elem is not None and value_elem.text is not None:
-                value_text = value_elem.text.strip()
-            else:
-                # Handle potential inline text without <value> tag
-                value_text = ''.join(data_elem.itertext()).strip()
-            data_fields[key] = value_text
-
-        coords_elem = pm.find('.//kml:Polygon//kml:coordinates', ns)
-        if coords_elem is not None and coords_elem.text:
-            polygon_text = 'POLYGON Z ((' + ', '.join(coords_elem.text.split()) + '))'
-        else:
-            polygon_text = 'POLYGON Z EMPTY'
-
-        placemark_metadata[name_text] = {
-            'begin': begin_text,
-            'end': end_text,
-            'icon': style_text,
-            'Polygon': polygon_text,
-            **data_fields
-        }
-
-    name_col = 'Name' if 'Name' in gdf.columns else 'name'
-
-    def map_field(field, default_value=None):
-        return gdf[name_col].map(lambda n: placemark_metadata.get(n, {}).get(field, default_value)) if name_col in gdf.columns else default_value
-
-    gdf['TimeSpan.begin'] = map_field('begin')
-    gdf['TimeSpan.end'] = map_field('end')
-    gdf['icon'] = map_field('icon')
-    gdf['Polygon'] = map_field('Polygon', '')
-
-    extended_fields = [
-        'ID', 'Timeliness', 'Station', 'Mode', 'ObservationTimeStart',
-        'ObservationTimeStop', 'ObservationDuration', 'OrbitAbsolute',
-        'OrbitRelative', 'Scenes', 'timestamp'
-    ]
-
-    for field in extended_fields:
-        gdf[field] = map_field(field)
-
-    # Fallbacks for missing values
-    if 'timestamp' not in gdf.columns or gdf['timestamp'].isna().all():
-        gdf['timestamp'] = gdf['TimeSpan.begin']
-    else:
-        gdf['timestamp'] = gdf['timestamp'].fillna(gdf['TimeSpan.begin'])
+    try:
+        # Drop caches of earlier contents of this KML before writing the new one
+        for stale_filepath in glob.glob(f"{glob.escape(local_filepath)}.*.parquet"):
+            os.remove(stale_filepath)
+        gdf.to_parquet(parquet_filepath, compression='zstd')
+    except Exception as e:
+        # Caching is best effort; the parsed GeoDataFrame is still usable
+        print(f"Could not cache {satellite_name} GeoDataFrame to {parquet_filepath}: {e}")
+    return gdf
 
-    if 'ID' not in gdf.columns:
-        gdf['ID'] = map_field('ID')
-    gdf['id'] = gdf['ID'].fillna(gdf[name_col]) if name_col in gdf.columns else gdf.get('ID', '')
+def file_sha256(path, chunk_size=1024 * 1024):
+    """
+    Returns the SHA-256 hex digest of a file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-    gdf['layer'] = layer_code
-    gdf['satellite'] = satellite_name
+def parse_kml_to_gdf(kml_path, layer_code, satellite_name, layer_prefix='NOMINAL'):
+    """
+    Streams the KML once with lxml and builds a GeoDataFrame of the Placemarks in layers
+    (Folders) whose name starts with layer_prefix, with geometry and table metadata together.
+    """
+    # One list per table column, appended to as Placemarks stream past
+    columns = {column: [] for column in ['Name', 'TimeSpan.begin', 'TimeSpan.end', 'icon', *EXTENDED_FIELDS, 'id']}
+    rings = []
+    # Name of each open Document/Folder, innermost last; a Placemark belongs to the innermost one
+    layer_names = []
+
+    context = etree.iterparse(
+        kml_path,
+        events=('start', 'end'),
+        tag=[*KML_CONTAINER_TAGS, KML_NAME_TAG, KML_PLACEMARK_TAG]
+    )
+    for event, elem in context:
+        if elem.tag in KML_CONTAINER_TAGS:
+            if event == 'start':
+                layer_names.append(None)
+            else:
+                layer_names.pop()
+                elem.clear()
+            continue
+        if event != 'end':
+            continue
+        if elem.tag == KML_NAME_TAG:
+            if elem.getparent().tag in KML_CONTAINER_TAGS:
+                layer_names[-1] = (elem.text or '').strip()
+            continue
 
-    return gdf
+        pm = elem
+        layer_name = layer_names[-1] if layer_names else None
+        # Skip layers that do not start with 'NOMINAL'
+        # This is to avoid loading layers that are not relevant acquisition plans
+        if layer_name and layer_name.startswith(layer_prefix):
+            data_fields = {}
+            for data_elem in XPATH_DATA(pm):
+                key = data_elem.get('name')
+                if not key:
+                    continue
+                value_elems = XPATH_DATA_VALUE(data_elem)
+                if value_elems and value_elems[0].text is not None:
+                    data_fields[key] = value_elems[0].text.strip()
+                else:
+                    # Handle potential inline text without <value> tag
+                    data_fields[key] = ''.join(data_elem.itertext()).strip()
+
+            coords_text = _first_text(XPATH_COORDINATES(pm)) or ''
+            if coords_text:
+                # KML tuples are "lon,lat[,alt]" separated by whitespace
+                dims = coords_text.split(None, 1)[0].count(',') + 1
+                rings.append(np.fromstring(coords_text.replace(',', ' '), sep=' ').reshape(-1, dims))
+            else:
+                rings.append(None)
+
+            name_text = _first_text(XPATH_NAME(pm))
+            begin_text = _first_text(XPATH_BEGIN(pm))
+            columns['Name'].append(name_text)
+            columns['TimeSpan.begin'].append(begin_text)
+            columns['TimeSpan.end'].append(_first_text(XPATH_END(pm)))
+            columns['icon'].append(_first_text(XPATH_STYLE_URL(pm)))
+            # Fallbacks for missing values
+            data_fields.setdefault('timestamp', begin_text)
+            for field in EXTENDED_FIELDS:
+                columns[field].append(data_fields.get(field))
+            columns['id'].append(data_fields.get('ID', name_text))
+
+        # Free the processed Placemark and its earlier siblings to keep memory flat
+        pm.clear()
+        while pm.getprevious() is not None:
+            del pm.getparent()[0]
+
+    # Build the GeoDataFrame once from the column lists; layer and satellite are constant per file
+    return gpd.GeoDataFrame(
+        {**columns, 'layer': layer_code, 'satellite': satellite_name},
+        geometry=polygons_from_rings(rings),
+        crs='EPSG:4326'
+    )
+
+def _first_text(texts):
+    return texts[0].strip() if texts else None
+
+def polygons_from_rings(rings):
+    """
+    Builds one polygon per outer-ring coordinate array (None for a Placemark without a
+    polygon) with a single vectorized shapely call instead of per-geometry WKT parsing.
+    """
+    present = [ring for ring in rings if ring is not None]
+    if not present:
+        return np.full(len(rings), None, dtype=object)
+
+    # Keep Z only when every ring has it, so all coordinates share one buffer
+    dims = 3 if all(ring.shape[1] == 3 for ring in present) else 2
+    coords = np.concatenate([ring[:, :dims] for ring in present])
+    ring_offsets = np.concatenate([[0], np.cumsum([len(ring) for ring in present])])
+    # Missing rings become empty polygons here and are replaced by None below
+    polygon_offsets = np.concatenate([[0], np.cumsum([ring is not None for ring in rings])])
+
+    geometry_type = shapely.GeometryType.POLYGON
+    geometries = shapely.from_ragged_array(geometry_type, coords, (ring_offsets, polygon_offsets))
+    geometries[[ring is None for ring in rings]] = None
+    return geometries
+
+def geometries_to_wkt(geometries):
+    """
+    Formats geometries as 3D WKT for the table's Polygon column, vectorized at export time.
+    """
+    wkt = shapely.to_wkt(np.asarray(geometries), rounding_precision=-1, output_dimension=3)
+    return np.where(pd.isna(wkt), 'POLYGON Z EMPTY', wkt)
 
 def collect_acq_plans_over_location(lat, lon, kml_data_objects):
     """
@@ -251,7 +379,8 @@ def collect_acq_plans_over_location(lat, lon, kml_data_objects):
     matches_by_satellite = []
 
     for _, gdf in kml_data_objects.items():
-        matches = gdf[gdf.geometry.contains(point)].copy()
+        # Query the STRtree instead of testing every polygon; 'within' tests point.within(polygon)
+        matches = gdf.iloc[sorted(gdf.sindex.query(point, predicate='within'))].copy()
         if not matches.empty:
             matches_by_satellite.append(matches)
 
@@ -260,23 +389,59 @@ def collect_acq_plans_over_location(lat, lon, kml_data_objects):
 
     return pd.DataFrame()
 
+def collect_acq_plans_over_locations(locations, kml_data_objects):
+    """
+    Batched version of collect_acq_plans_over_location for a dict of {location_name: (lat, lon)}.
+    Each satellite's STRtree is queried with all locations at once; returns a dict
+    mapping each location name to a DataFrame of the acquisition plans that contain it.
+    """
+    location_names = np.asarray(list(locations), dtype=object)
+    points = shapely.points(
+        [lon for _, lon in locations.values()],
+        [lat for lat, _ in locations.values()]
+    )
+    frames_by_location = {location_name: [] for location_name in location_names}
 
-def _sanitize_for_table(value):
-    if isinstance(value, str):
-        return " ".join(value.split())
-    if pd.isna(value):
-        return ""
-    return str(value)
+    for _, gdf in kml_data_objects.items():
+        # Query the STRtree built at load time; 'within' tests point.within(polygon)
+        point_idx, positions = gdf.sindex.query(points, predicate='within')
+        # Keep the acquisition plans in their original KML order
+        order = np.argsort(positions, kind='stable')
+        matches = gdf.iloc[positions[order]].assign(location=location_names[point_idx[order]])
+        for location_name, location_matches in matches.groupby('location', sort=False):
+            frames_by_location[location_name].append(location_matches.drop(columns='location'))
+
+    return {
+        location_name: pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        for location_name, frames in frames_by_location.items()
+    }
+
+def write_dataframe_tsv(df, path):
+    """
+    Writes df to path as TSV. Whitespace runs inside text cells collapse to a single space
+    (so cells never contain tabs or newlines) and missing values are written as empty cells.
+    """
+    columns = {}
+    for column in df.columns:
+        series = df[column]
+        if series.dtype == object or pd.api.types.is_string_dtype(series):
+            series = series.astype("string").str.replace(r"\s+", " ", regex=True).str.strip()
+        columns[column] = series
 
+    pd.DataFrame(columns).to_csv(path, sep="\t", index=False, lineterminator="\n", na_rep="", encoding="utf-8")
 
-def dataframe_to_tsv(df):
-    sanitized = df.copy()
-    for column in sanitized.columns:
-        sanitized[column] = sanitized[column].map(_sanitize_for_table)
+def load_coastlines(output_dir):
+    """
+    Loads the Natural Earth coastlines as a GeoDataFrame. They are downloaded on first use
+    and cached as GeoParquet in output_dir, so later runs read them straight from disk.
+    """
+    parquet_filepath = os.path.join(output_dir, "ne_110m_coastline.parquet")
+    if os.path.exists(parquet_filepath):
+        return gpd.read_parquet(parquet_filepath)
 
-    buffer = io.StringIO()
-    sanitized.to_csv(buffer, sep="\t", index=False, lineterminator="\n")
-    return buffer.getvalue().rstrip()
+    coastlines = gpd.read_file(COASTLINE_URL)[['geometry']]
+    coastlines.to_parquet(parquet_filepath)
+    return coastlines
 
 if __name__ == "__main__":
     print(f"Fetching latest KML links from: {ACQUISITION_PLANS_URL}")
@@ -290,10 +455,19 @@ if __name__ == "__main__":
             print(f"{satellite}: {filename}")
 
         print("\n--- Downloading and Parsing KML Files ---")
-        for satellite, filename in latest_kml_filenames.items():
-            kml_object = download_and_parse_kml(satellite, filename, output_directory)
-            if kml_object is not None:
-                kml_data_objects[satellite] = kml_object
+        # Download and parse the satellites concurrently; each one finishes independently
+        results = {}
+        with ThreadPoolExecutor(max_workers=len(latest_kml_filenames)) as executor:
+            futures = {
+                executor.submit(download_and_parse_kml, satellite, filename, output_directory): satellite
+                for satellite, filename in latest_kml_filenames.items()
+            }
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+        # Keep the page order of the satellites so plot colors stay stable
+        for satellite in latest_kml_filenames:
+            if results.get(satellite) is not None:
+                kml_data_objects[satellite] = results[satellite]
 
         print("\n--- KML Data Objects Loaded ---")
         for satellite, kml_object in kml_data_objects.items():
@@ -324,33 +498,31 @@ if __name__ == "__main__":
             "Chicago, IL": "ord.tsv"
         }
 
+        location_dfs = collect_acq_plans_over_locations(locations, kml_data_objects)
+
         for location_name, (lat, lon) in locations.items():
             print(f"\nProcessing acquisition plans for {location_name} ({lat:.4f}, {lon:.4f})")
-            location_df = collect_acq_plans_over_location(lat, lon, kml_data_objects)
+            location_df = location_dfs[location_name]
 
             if location_df.empty:
                 print("  No acquisition plan passes over this location for any satellite.")
                 continue
 
-            for column in TABLE_COLUMNS:
-                if column not in location_df.columns:
-                    location_df[column] = ""
+            location_df['Polygon'] = geometries_to_wkt(location_df.geometry.values)
 
             location_df = location_df.sort_values(
                 by="TimeSpan.begin",
                 key=lambda series: pd.to_datetime(series, errors='coerce')
             ).reset_index(drop=True)
 
-            table_text = dataframe_to_tsv(location_df[TABLE_COLUMNS])
-
             output_filename = location_files.get(location_name)
             if output_filename is None:
                 print("  No output filename configured for this location; skipping export.")
                 continue
 
             output_path = os.path.join(output_directory, output_filename)
-            with open(output_path, "w", encoding="utf-8", newline="") as tsv_file:
-                tsv_file.write(table_text + "\n")
+            # Select the table columns in one step, adding any missing ones as empty strings
+            write_dataframe_tsv(location_df.reindex(columns=TABLE_COLUMNS, fill_value=""), output_path)
 
             print(f"  Wrote {len(location_df)} rows to {output_path}")
 
@@ -362,24 +534,23 @@ if __name__ == "__main__":
         handles = []
         # Plot acquisition-plan layers and build legend handles correctly here
         for idx, (satellite, gdf) in enumerate(kml_data_objects.items()):
-            gdf.plot(ax=ax, color=colors[idx % len(colors)], alpha=0.1, edgecolor='k')
+            # Draw a simplified copy; vertices finer than the tolerance are invisible at world scale.
+            # The original geometries stay untouched for the spatial queries above.
+            display_geometry = gdf.geometry.simplify(PLOT_SIMPLIFY_TOLERANCE, preserve_topology=False)
+            display_geometry.plot(ax=ax, color=colors[idx % len(colors)], alpha=0.1, edgecolor='k')
             handles.append(mpatches.Patch(color=colors[idx % len(colors)], label=satellite.strip(), alpha=0.1))
 
-        # Draw coastlines using Basemap for better geographic context
+        # Draw Natural Earth coastlines for better geographic context
         try:
-            m = Basemap(projection='cyl',
-                        llcrnrlat=-90, urcrnrlat=90,
-                        llcrnrlon=-180, urcrnrlon=180,
-                        resolution='l',
-                        ax=ax)
+            coastlines = load_coastlines(output_directory)
             # Draw coastlines on the axes; choose zorder so coastlines sit between layers and markers
-            m.drawcoastlines(linewidth=0.5, color='black', zorder=2)
-            # If Basemap altered axis limits, reset to global extent for consistency
+            coastlines.plot(ax=ax, linewidth=0.5, color='black', zorder=2)
+            # Keep a global extent for consistency
             ax.set_xlim(-180, 180)
             ax.set_ylim(-90, 90)
         except Exception as e:
-            # If Basemap is unavailable or fails, log and continue (markers/annotations still plot)
-            print(f"Basemap drawing failed: {e}")
+            # If the coastlines cannot be loaded, log and continue (markers/annotations still plot)
+            print(f"Coastline drawing failed: {e}")
 
         # Predefined offset vectors (in points) to reduce overlapping labels; these will be cycled
         offsets = [(0, 10), (10, 10), (-10, 10), (10, -10), (-10, -10), (0, -12)]
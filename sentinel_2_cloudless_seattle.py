@@ -1,6 +1,6 @@
 """
 Sentinel-2 Cloudless Image Processor for Seattle AOI
-Automated pipeline: Earth Engine filtering → S3 download → GDAL processing
+Automated pipeline: Earth Engine filtering → GDAL processing (streamed from S3 via /vsis3/)
 Adapted from: https://documentation.dataspace.copernicus.eu/APIs/S3.html#example-script-to-download-product-using-boto3
 
 Required Python packages:
@@ -11,17 +11,20 @@ Required Python packages:
 - localtileserver
 - geemap
 - requests
+- requests-cache
 - geopandas
 - earthengine-api
 
 System requirements:
-- gdal-bin (install with sudo apt-get install gdal-bin)
+- python3-gdal (install with sudo apt-get install python3-gdal)
 
 Standard library modules:
 - os
 - sys
 - subprocess
 - typing
+- hashlib
+- functools
 """
 
 import os
@@ -29,10 +32,52 @@ import ee
 import sys
 import boto3
 import geemap
-import requests
+import hashlib
+import functools
 import subprocess
+import requests_cache
 import geopandas as gpd
+from osgeo import gdal
 from typing import Union, List
+from botocore.config import Config
+from urllib3.util.retry import Retry
+from requests.adapters import HTTPAdapter
+from boto3.s3.transfer import TransferConfig
+from concurrent.futures import ThreadPoolExecutor
+
+# Shared HTTP session so STAC lookups reuse TCP/TLS connections.
+# Successful responses are cached on disk for a day, so re-runs do not refetch the same items.
+SESSION = requests_cache.CachedSession(cache_name='stac_cache', backend='sqlite', expire_after=86400)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504])
+))
+
+# Maximum number of STAC items looked up at the same time (matches the session's connection pool)
+STAC_WORKERS = 16
+
+# Number of product files fetched from S3 at the same time
+DOWNLOAD_WORKERS = 16
+
+# Transfer settings shared by every S3 download job.
+# The TCI_10m JP2 is a few hundred MB, so it is split into concurrent ranged GETs
+# and written with 1 MB IO chunks instead of boto3's 16 KB default.
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=5 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=16,
+    max_io_queue=1000,
+    io_chunksize=1024 * 1024,
+    use_threads=True
+)
+
+# botocore keeps only 10 connections per client by default; leave room for every
+# download worker plus the ranged GETs of the large TCI file
+S3_CLIENT_CONFIG = Config(max_pool_connections=DOWNLOAD_WORKERS + TRANSFER_CONFIG.max_request_concurrency)
+
+# Raise Python exceptions from GDAL errors instead of returning None
+gdal.UseExceptions()
 
 # Download GeoJSON for Seattle AOI
 def download_seattle_geojson():
@@ -63,45 +108,53 @@ def filter_sentinel2_collection(aoi):
     .limit(15)
     return sentinel2
 
-# Function to compute cloud percentage using SCL band
-def calculate_cloud_cover(image):
-    aoi = get_seattle_aoi("seattle.shp")
-    scl = image.select('SCL')
+# Build the per-image cloud percentage function using SCL band.
+# The AOI geometry is captured once instead of re-reading the shapefile for every image.
+def make_cloud_cover_fn(aoi):
+    geometry = aoi.geometry()
 
-    # Remap SCL classes: 3, 8, 9, 10 → 1 (cloud), all else → 0
-    cloud_mask = scl.remap([3, 8, 9, 10], [1, 1, 1, 1], 0).rename('cloud_mask')
+    def calculate_cloud_cover(image):
+        # Count every SCL class over the AOI in a single reduceRegion pass
+        histogram = ee.Dictionary(image.select('SCL').reduceRegion(
+            reducer=ee.Reducer.frequencyHistogram(),
+            geometry=geometry,
+            scale=20,
+            maxPixels=1e10
+        ).get('SCL'))
 
-    total_pixels = image.select('B2').reduceRegion(
-        reducer=ee.Reducer.count(),
-        geometry=aoi.geometry(),
-        scale=20,
-        maxPixels=1e10
-    ).get('B2')
+        # SCL classes 3, 8, 9, 10 are cloud (or cloud shadow); missing classes count as zero
+        cloud_pixels = ee.Number(0)
+        for scl_class in ['3', '8', '9', '10']:
+            cloud_pixels = cloud_pixels.add(ee.Number(histogram.get(scl_class, 0)))
+        total_pixels = ee.Number(histogram.values().reduce(ee.Reducer.sum()))
 
-    cloud_pixels = cloud_mask.reduceRegion(
-        reducer=ee.Reducer.sum(),
-        geometry=aoi.geometry(),
-        scale=20,
-        maxPixels=1e10
-    ).get('cloud_mask')
+        cloud_percentage = cloud_pixels.divide(total_pixels).multiply(100)
+        return image.set('cloud_cover_aoi', cloud_percentage)
 
-    cloud_percentage = ee.Number(cloud_pixels).divide(ee.Number(total_pixels)).multiply(100)
-    return image.set('cloud_cover_aoi', cloud_percentage)
+    return calculate_cloud_cover
 
 # Apply cloud percentage computation
 def select_latest_cloudless_image(sorted_images):
-    image_list = sorted_images.toList(15)
-    latest_cloudless_product_id = ''
-
-    for i in range(15):
-        img = ee.Image(image_list.get(i))
-        props = img.getInfo()['properties']
-        cloud = props.get('cloud_cover_aoi')
-        product_id = props.get('PRODUCT_ID')
-        if latest_cloudless_product_id == '' and cloud < 0.1:
-            latest_cloudless_product_id = product_id
-            return latest_cloudless_product_id
-    return None
+    # Filter and pick the latest cloudless image server-side; only its product ID is fetched
+    best = sorted_images \
+    .filter(ee.Filter.lt('cloud_cover_aoi', 0.1)) \
+    .sort('system:time_start', False) \
+    .first()
+    return ee.Algorithms.If(best, best.get('PRODUCT_ID'), None).getInfo()
+
+@functools.lru_cache(maxsize=None)
+def fetch_tci_href(item_id: str) -> str:
+    """
+    Fetch the TCI_10m href for a single STAC item ID.
+
+    Results are memoized for the session; errors are raised and therefore not cached.
+    """
+    url = f"https://stac.dataspace.copernicus.eu/v1/collections/sentinel-2-l2a/items/{item_id}"
+    response = SESSION.get(url, timeout=10)
+    response.raise_for_status()
+
+    data = response.json()
+    return data['assets']['TCI_10m']['href']
 
 def get_tci_href(ids: Union[str, List[str]]) -> Union[str, List[str], None]:
     """
@@ -117,12 +170,7 @@ def get_tci_href(ids: Union[str, List[str]]) -> Union[str, List[str], None]:
     def fetch_href(item_id: str) -> str:
         """Fetch href for single ID."""
         try:
-            url = f"https://stac.dataspace.copernicus.eu/v1/collections/sentinel-2-l2a/items/{item_id}"
-            response = requests.get(url)
-            response.raise_for_status()
-
-            data = response.json()
-            return data['assets']['TCI_10m']['href']
+            return fetch_tci_href(item_id)
 
         except Exception as e:
             print(f"Error fetching {item_id}: {e}")
@@ -134,7 +182,13 @@ def get_tci_href(ids: Union[str, List[str]]) -> Union[str, List[str], None]:
 
     # Handle list of IDs
     elif isinstance(ids, list):
-        return [fetch_href(item_id) for item_id in ids]
+        # Issue every distinct lookup at once so the batch costs about one round trip
+        unique_ids = list(dict.fromkeys(ids))
+        if not unique_ids:
+            return []
+        with ThreadPoolExecutor(max_workers=min(len(unique_ids), STAC_WORKERS)) as executor:
+            hrefs = dict(zip(unique_ids, executor.map(fetch_href, unique_ids)))
+        return [hrefs[item_id] for item_id in ids]
 
     return None
 
@@ -149,36 +203,103 @@ def download(bucket, product: str, target: str = "") -> None:
         product: Path to product
         target: Local catalog for downloaded files. Should end with an `/`. Default current directory.
     """
-    files = bucket.objects.filter(Prefix=product)
-    if not list(files):
+    # List the product once; re-iterating the filter would re-issue every LIST request
+    files = list(bucket.objects.filter(Prefix=product))
+    if not files:
         raise FileNotFoundError(f"Could not find any files for {product}")
+
+    # Create all local directories up front so the worker threads never race on makedirs
+    jobs = []
     for file in files:
-        os.makedirs(os.path.dirname(file.key), exist_ok=True)
-        if not os.path.isdir(file.key):
-            bucket.download_file(file.key, f"{target}{file.key}")
-
-def process_gdalwarp(s3_path, output_path):
-    process = subprocess.Popen([
-        'gdalwarp',
-        '-overwrite',
-        '-of', 'GTiff',
-        '-tr', '10.0', '-10.0',
-        '-tap',
-        '-cutline', 'seattle.geojson',
-        '-cl', 'seattle',
-        '-crop_to_cutline',
-        '-dstalpha',
-        '-co', 'COMPRESS=NONE',
-        '-co', 'BIGTIFF=IF_NEEDED',
-        s3_path,
-        output_path
-    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-
-    # Print output as it becomes available
-    for line in process.stdout:
-        print(line, end='')
-    for line in process.stderr:
-        print(line, end='')
+        local_path = f"{target}{file.key}"
+        os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+        if not os.path.isdir(local_path):
+            jobs.append((file.key, local_path))
+
+    # Stream the product files in parallel; a single sequential loop is dominated by per-request latency
+    client = bucket.meta.client
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+        futures = [
+            executor.submit(client.download_file, bucket.name, key, local_path, Config=TRANSFER_CONFIG)
+            for key, local_path in jobs
+        ]
+        for future in futures:
+            future.result()
+
+def get_eodata_bucket(aws_access_key_id, aws_secret_access_key):
+    s3 = boto3.resource(
+        's3',
+        endpoint_url='https://eodata.dataspace.copernicus.eu',
+        aws_access_key_id=aws_access_key_id,
+        aws_secret_access_key=aws_secret_access_key,
+        region_name='default',
+        config=S3_CLIENT_CONFIG
+    )
+    return s3.Bucket("eodata")
+
+def gdal_s3_config(aws_access_key_id, aws_secret_access_key):
+    # Lets GDAL's /vsis3/ handler read straight from the CDSE eodata bucket
+    return {
+        'AWS_S3_ENDPOINT': 'eodata.dataspace.copernicus.eu',
+        'AWS_ACCESS_KEY_ID': aws_access_key_id,
+        'AWS_SECRET_ACCESS_KEY': aws_secret_access_key,
+        'AWS_VIRTUAL_HOSTING': 'FALSE',
+        'AWS_HTTPS': 'YES',
+        'CPL_VSIL_CURL_USE_HEAD': 'NO',
+        # Skip the bucket listing and sidecar probes on open, and cache the ranges already read
+        'GDAL_DISABLE_READDIR_ON_OPEN': 'EMPTY_DIR',
+        'CPL_VSIL_CURL_ALLOWED_EXTENSIONS': '.jp2',
+        'VSI_CACHE': 'TRUE',
+    }
+
+def process_gdalwarp(s3_path, output_path, config=None):
+    # Warp in-process through the GDAL bindings rather than spawning gdalwarp.
+    # Returns False if the warp failed, so the caller does not use a stale output file.
+    options = {'GDAL_NUM_THREADS': 'ALL_CPUS', 'GDAL_CACHEMAX': '2048', **(config or {})}
+    for key, value in options.items():
+        gdal.SetConfigOption(key, value)
+
+    try:
+        gdal.Warp(
+            output_path,
+            s3_path,
+            options=gdal.WarpOptions(
+                format='COG',
+                xRes=10.0,
+                yRes=10.0,
+                targetAlignedPixels=True,
+                cutlineDSName='seattle.geojson',
+                cutlineLayer='seattle',
+                cropToCutline=True,
+                dstAlpha=True,
+                # Warp and compress on all cores
+                multithread=True,
+                warpOptions=['NUM_THREADS=ALL_CPUS'],
+                creationOptions=[
+                    'COMPRESS=DEFLATE',
+                    'PREDICTOR=2',
+                    'NUM_THREADS=ALL_CPUS',
+                    'BIGTIFF=IF_NEEDED'
+                ],
+                options=['-overwrite'],
+                callback=gdal.TermProgress_nocb
+            )
+        )
+    except RuntimeError as e:
+        print(f"gdal.Warp failed: {e}")
+        return False
+    finally:
+        for key in options:
+            gdal.SetConfigOption(key, None)
+    return True
+
+def sha256_file(path, chunk_size=1024 * 1024):
+    # hashlib is backed by OpenSSL, which uses the CPU's SHA extensions when available
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
 
 def main():
     # project = "your_project_id"
@@ -190,7 +311,7 @@ def main():
     convert_geojson_to_shapefile("seattle.geojson", "seattle.shp")
     aoi = get_seattle_aoi("seattle.shp")
     sentinel2 = filter_sentinel2_collection(aoi)
-    sorted_images = sentinel2.map(calculate_cloud_cover)
+    sorted_images = sentinel2.map(make_cloud_cover_fn(aoi))
     latest_cloudless_product_id = select_latest_cloudless_image(sorted_images)
     if not latest_cloudless_product_id:
         print("No cloudless products found.")
@@ -199,19 +320,15 @@ def main():
     s3_path = get_tci_href(latest_cloudless_product_id).replace("s3://eodata/", "")
     print(f"s3 path: {s3_path}")
 
-    session = boto3.session.Session()
-    s3 = boto3.resource(
-        's3',
-        endpoint_url='https://eodata.dataspace.copernicus.eu',
-        aws_access_key_id=aws_access_key_id,
-        aws_secret_access_key=aws_secret_access_key,
-        region_name='default'
-    )
-
-    download(s3.Bucket("eodata"), s3_path)
-    process_gdalwarp(s3_path, "Seattle.tif")
-    result = subprocess.run(['sha256sum', 'Seattle.tif'], capture_output=True, text=True, check=True)
-    print(result.stdout)
+    # GDAL fetches only the byte ranges it needs for the cutline, so the full
+    # granule is never written to disk. download(get_eodata_bucket(...), s3_path)
+    # is still available when a local copy is wanted.
+    if not process_gdalwarp(
+        f"/vsis3/eodata/{s3_path}", "Seattle.tif",
+        config=gdal_s3_config(aws_access_key_id, aws_secret_access_key)
+    ):
+        sys.exit(1)
+    print(f"{sha256_file('Seattle.tif')}  Seattle.tif")
 
 if __name__ == '__main__':
     main()